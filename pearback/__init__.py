@@ -1,11 +1,31 @@
+
 # API
-from ._pearback import load_backup
-from ._pearback import print_status
-from ._pearback import print_manifest
-from ._pearback import print_filerecords
-from ._pearback import extract_files
-from ._pearback import extract
-from ._pearback import list_all
-from ._pearback import summarize
-from ._pearback import changed_files
-from ._pearback import extract_changed_and_removed_files
+#
+# the API functions live in _pearback, which is only imported on first use.
+# This way the commandline tool can parse its arguments (and print help)
+# without paying for importing _pearback and all of its dependencies.
+_api = ('load_backup',
+        'load_backup_cached',
+        'print_status',
+        'print_manifest',
+        'print_filerecords',
+        'extract_files',
+        'extract',
+        'list_all',
+        'summarize',
+        'changed_files',
+        'extract_changed_and_removed_files')
+
+# needed for 'from pearback import *', which otherwise finds nothing to import
+__all__ = list(_api)
+
+
+def __getattr__(name):
+    if name in _api:
+        from . import _pearback
+        return getattr(_pearback, name)
+    raise AttributeError("module 'pearback' has no attribute '{:s}'".format(name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_api))
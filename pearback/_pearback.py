@@ -26,25 +26,28 @@ SOFTWARE.
 
 # TODO: replace generic exceptions with PearBackError derived
 #       exceptions where appropriate
-# TODO: early abort in diff function as soon as first difference is
-#       detected, instead of always hashing full contents
 
 
+import sys as _sys
 import sqlite3
+import struct as _struct
 import plistlib as _plistlib
-import biplist as _biplist
 from collections import namedtuple as _nt
+from dataclasses import dataclass as _dataclass
 from collections import OrderedDict as _OD
 from enum import Enum as _Enum
 from binascii import hexlify as _hexlify
 from datetime import datetime as _datetime
-from time import gmtime as _gmtime
-from pytz import UTC as _UTC
+from datetime import timezone as _timezone
 from functools import partial as _partial
+from functools import lru_cache as _lru_cache
+from operator import attrgetter as _attrgetter
 import os as _os
+import mmap as _mmap
+import pickle as _pickle
 import shutil as _shutil
 from collections import Counter as _Counter
-from hashlib import sha256 as _sha256
+from collections import deque as _deque
 from hashlib import sha1 as _sha1
 
 
@@ -90,6 +93,43 @@ class MbdbParseError(PearBackError):
     pass
 
 
+@_dataclass
+class FileEntry:
+    ''' a single file record in the backup (from Manifest.db or Manifest.mbdb)
+
+    There can be hundreds of thousands of these in a backup, so this uses
+    __slots__ to keep the memory footprint (and attribute access time) down.
+    '''
+
+    __slots__ = ('fileID', 'domain', 'relativePath', 'uid', 'gid', 'mtime',
+                 'ctime', 'btime', 'inode', 'mode', 'filetype', 'permissions',
+                 'size', 'protection', 'extended_attributes', 'linktarget',
+                 'digest')
+
+    fileID: str
+    domain: str
+    relativePath: str
+    uid: int
+    gid: int
+    mtime: _datetime
+    ctime: _datetime
+    btime: _datetime
+    inode: int
+    mode: int
+    filetype: FileType
+    permissions: str
+    size: int
+    protection: int
+    extended_attributes: dict
+    linktarget: str
+    digest: str
+
+
+# map the filetype bits of the mode field to a FileType, looking up the values
+# in a dict is a lot faster than calling FileType(...) for each record
+_filetypes = {t.value: t for t in FileType}
+
+
 # instead of defining full classes, I use namedtuples for simplicity
 
 # a backup object consists of rootdir, connection to Manifest.db (None when
@@ -99,13 +139,6 @@ class MbdbParseError(PearBackError):
 _backup = _nt('iOSbackup', 'backuptype rootdir db status manifest filerecords')
 
 
-# a simple object for representing a single entry in the Files table
-_file_entry = _nt('file_entry', 'fileID domain relativePath uid gid '
-                                'mtime ctime btime inode mode filetype '
-                                'permissions size protection '
-                                'extended_attributes linktarget digest')
-
-
 # namedtuple for representing the values in the plist in the file field in iOS10
 # Manifest.db databases
 _plistvals = _nt('plist_values', 'uid gid mtime ctime btime inode mode '
@@ -118,6 +151,34 @@ _plistvals = _nt('plist_values', 'uid gid mtime ctime btime inode mode '
 _known_plist_keys = set(['$version', '$top', '$objects', '$archiver'])
 
 
+# fixed size part of an entry in Manifest.mbdb that follows the strings:
+# mode, inode, uid, gid, mtime, ctime, btime, size, protection, numprops
+_mbdb_fixed = _struct.Struct('>HQIIIIIQBB')
+
+# length prefix of strings in Manifest.mbdb
+_mbdb_strlen = _struct.Struct('>H')
+
+
+# since Python 3.8, plistlib knows about the UIDs used in NSKeyedArchiver
+# plists, and it parses these quite a bit faster than biplist. So use plistlib
+# when we can and fall back to biplist otherwise.
+if hasattr(_plistlib, 'UID'):
+    _read_bplist = _plistlib.loads
+    _uid_value = _attrgetter('data')
+else:
+    import biplist as _biplist
+    _read_bplist = _biplist.readPlistFromString
+    _uid_value = _attrgetter('integer')
+
+
+# all timestamps in backups are in UTC
+_UTC = _timezone.utc
+
+
+# increment when the cached records change, so older caches are ignored
+_cacheversion = 1
+
+
 #######
 # API #
 #######
@@ -148,6 +209,39 @@ def load_backup(filepath):
     return _backup(backuptype, rootdir, db, status, manifest, filerecords)
 
 
+def load_backup_cached(filepath):
+    ''' load backup like load_backup, but cache the parsed file records
+
+    Parsing Manifest.db (or Manifest.mbdb) is by far the most expensive part
+    of working with a backup, so the parsed file records are stored in a cache
+    file in ~/.cache/pearback (or $XDG_CACHE_HOME/pearback). There is one
+    cache file per backup directory, which is tied to the manifest file by its
+    inode, modification time and size, and is overwritten when the manifest
+    changes. Set the environment variable PEARBACK_CACHE to 0 to disable the
+    cache. '''
+
+    backup = load_backup(filepath)
+
+    if _os.environ.get('PEARBACK_CACHE', '1') == '0':
+        return backup
+
+    if backup.backuptype == BackupType.IOS10:
+        manifestfile = _os.path.join(backup.rootdir, 'Manifest.db')
+    else:
+        manifestfile = _os.path.join(backup.rootdir, 'Manifest.mbdb')
+
+    st = _os.stat(manifestfile)
+    key = (_cacheversion, st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+    # name the cache after the backup directory, so a stale cache is replaced
+    # instead of piling up next to the new one
+    cachename = _sha1(_os.fsencode(backup.rootdir)).hexdigest() + '.pickle'
+    cachefile = _os.path.join(_cachedir(), cachename)
+
+    filerecords = _partial(_cached_file_records, cachefile, key,
+                           backup.filerecords)
+    return backup._replace(filerecords=filerecords)
+
+
 def print_status(backup, header=True, sep=None):
     ''' prints the contents of Status.plist of the given backup object '''
 
@@ -211,9 +305,9 @@ def print_filerecords(filerecs, sep='\t', headers=True, fields=None):
     '''
 
     if fields is not None:
-        cols = [f for f in fields if f in _file_entry._fields]
+        cols = [f for f in fields if f in FileEntry.__slots__]
     else:
-        cols = [f for f in _file_entry._fields]
+        cols = [f for f in FileEntry.__slots__]
 
     # do not include extended attributes, this can mess with separators and
     # produces a lot of extra data for some files
@@ -233,74 +327,111 @@ def print_filerecords(filerecs, sep='\t', headers=True, fields=None):
         print(sep.join(vals))
 
 
-def extract_files(backuptype, filerecords, rootdir, outdir, hardlink=False):
-    ''' extract filerecords to outdir (using hardlinks if hardlink is True) '''
+def extract_files(backuptype, filerecords, rootdir, outdir, hardlink=False,
+                  jobs=1):
+    ''' extract filerecords to outdir (using hardlinks if hardlink is True)
 
-    outdir = _checkout(outdir)
+    When files are copied instead of linked, up to jobs files are copied in
+    parallel. '''
 
-    for f in filerecords:
-        if f.filetype == FileType.Symlink:
-            # skip symlinks for now, they can also point to absolute paths on
-            # original filesystem (i.e. /private/var/mobile/...)
-            #_os.symlink(f.linktarget, target)
-            continue
-
-        # split the domain into domain, subdomain
-        domain = f.domain.split('-', 1)
-        if len(domain) == 1:
-            target = _os.path.join(outdir, domain[0], f.relativePath)
-        else:
-            target = _os.path.join(outdir, domain[0], domain[1], f.relativePath)
+    outdir = _checkout(outdir)
 
-        if f.filetype == FileType.Directory:
-            if _os.path.exists(target):
-                if not _os.path.isdir(target):
-                    raise ExtractError('target exists but is not a directory: {:s}'.format(target))
-            else:
-                _os.makedirs(target, mode=0o750)
-
-        elif f.filetype == FileType.RegularFile:
-            # the parentdir is not always included in the sequence of filerecords
-            parentdir, child = _os.path.split(target)
-            if _os.path.exists(parentdir):
-                if not _os.path.isdir(parentdir):
-                    raise ExtractError('parentdir is not a directory: {:s}'.format(parentdir))
-            else:
-                _os.makedirs(parentdir, mode=0o750)
+    # output directory per domain
+    domaindirs = {}
+    # directories that we already created (or found to exist)
+    createddirs = set()
 
-            if f.size == 0:
-                # create empty file
-                _os.mknod(target)
-            else:
-                if backuptype.value == BackupType.IOS10.value:
-                    source = _os.path.join(rootdir, f.fileID[0:2], f.fileID)
-                elif backuptype.value == BackupType.IOS5TO9.value:
-                    source = _os.path.join(rootdir, f.fileID)
-                else:
-                    raise ValueError('unknown backuptype in extract function')
+    # copying is I/O bound (and the copying itself is done by the kernel
+    # without holding the GIL), so copy files with a pool of threads
+    pool = None
+    if hardlink is False and jobs > 1:
+        from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+        pool = _ThreadPoolExecutor(max_workers=jobs)
+    pending = _deque()
 
-                if hardlink is True:
-                    _os.link(source, target)
+    try:
+        for f in filerecords:
+            if f.filetype == FileType.Symlink:
+                # skip symlinks for now, they can also point to absolute paths on
+                # original filesystem (i.e. /private/var/mobile/...)
+                #_os.symlink(f.linktarget, target)
+                continue
+
+            # split the domain into domain, subdomain, there are only a few
+            # hundred unique domains so remember the resulting directories
+            domaindir = domaindirs.get(f.domain)
+            if domaindir is None:
+                domaindir = _os.path.join(outdir, *f.domain.split('-', 1))
+                domaindirs[f.domain] = domaindir
+            target = _os.path.join(domaindir, f.relativePath)
+
+            if f.filetype == FileType.Directory:
+                if target not in createddirs:
+                    try:
+                        _os.makedirs(target, mode=0o750, exist_ok=True)
+                    except (FileExistsError, NotADirectoryError):
+                        raise ExtractError('target exists but is not a directory: {:s}'.format(target))
+                    createddirs.add(target)
+
+            elif f.filetype == FileType.RegularFile:
+                # the parentdir is not always included in the sequence of filerecords
+                parentdir = _os.path.dirname(target)
+                if parentdir not in createddirs:
+                    try:
+                        _os.makedirs(parentdir, mode=0o750, exist_ok=True)
+                    except (FileExistsError, NotADirectoryError):
+                        raise ExtractError('parentdir is not a directory: {:s}'.format(parentdir))
+                    createddirs.add(parentdir)
+
+                if f.size == 0:
+                    # create empty file
+                    _os.mknod(target)
                 else:
-                    _shutil.copyfile(source, target)
-
-
-def extract(backup, outdir, hardlink=False, progress=False):
+                    if backuptype.value == BackupType.IOS10.value:
+                        source = _os.path.join(rootdir, f.fileID[0:2], f.fileID)
+                    elif backuptype.value == BackupType.IOS5TO9.value:
+                        source = _os.path.join(rootdir, f.fileID)
+                    else:
+                        raise ValueError('unknown backuptype in extract function')
+
+                    if hardlink is True:
+                        _os.link(source, target)
+                    elif pool is None:
+                        _copyfile(source, target)
+                    else:
+                        pending.append(pool.submit(_copyfile, source, target))
+                        # limit the number of queued copies, this also raises
+                        # errors of failed copies early
+                        if len(pending) > 64*jobs:
+                            pending.popleft().result()
+
+        # wait for the remaining copies, raises errors of failed copies
+        while pending:
+            pending.popleft().result()
+    finally:
+        if pool is not None:
+            # when something went wrong, do not wait for the queued copies
+            for fut in pending:
+                fut.cancel()
+            pool.shutdown()
+
+
+def extract(backup, outdir, hardlink=False, progress=False, jobs=1):
     ''' extract files from given backup to outdir
 
-    if hardlink is True, files will be linked instead of copied '''
+    if hardlink is True, files will be linked instead of copied, otherwise
+    up to jobs files are copied in parallel
+
+    Note that the progress bar counts the files that are handed to the copy
+    threads, so it may reach 100% while the last copies are still running. '''
 
     filerecords = backup.filerecords()
     if progress is True:
-        if backup.backuptype == BackupType.IOS10:
-            total = _db_nr_of_files(backup)
-        else:
-            filerecords = list(filerecords)
-            total = len(filerecords)
-
+        total = _nr_of_files(backup)
         filerecords = _progresswrapper(filerecords, 'extracting', 'files', total)
 
-    extract_files(backup.backuptype, filerecords, backup.rootdir, outdir, hardlink)
+    extract_files(backup.backuptype, filerecords, backup.rootdir, outdir,
+                  hardlink, jobs)
 
 
 def list_all(backup, sep='\t', headers=True):
@@ -310,8 +441,10 @@ def list_all(backup, sep='\t', headers=True):
     print_filerecords(backup.filerecords(), sep, headers)
 
 
-def summarize(backup):
-    ''' prints a brief summary on the given backup '''
+def summarize(backup, progress=False):
+    ''' prints a brief summary on the given backup
+
+    if progress is True, a progress bar is shown while counting files '''
 
     print()
     print_manifest(backup)
@@ -320,12 +453,16 @@ def summarize(backup):
     print()
     print("File stats")
     print("==========")
-    c = _Counter(r.filetype for r in backup.filerecords())
+    filerecords = backup.filerecords()
+    if progress is True:
+        total = _nr_of_files(backup)
+        filerecords = _progresswrapper(filerecords, 'counting', 'files', total)
+    c = _Counter(r.filetype for r in filerecords)
     for k,v in c.items():
         print("{:25s} {:25s}".format(k, str(v)))
 
 
-def changed_files(backup1, backup2):
+def changed_files(backup1, backup2, by_metadata=False, progress=False):
     ''' yield files that are different or only exist in one of the backups.
 
     Yields file-tuples: (file1, file2)
@@ -338,64 +475,59 @@ def changed_files(backup1, backup2):
     properties. Moved or otherwise duplicate files are not considered between
     backups. Also, when the size is different, no actual comparing is done,
     based on the fact that files of different size have different contents by
-    definition. '''
-
-    # we are only interested in files
-    b1recs = filter(lambda r: r.filetype == FileType.RegularFile, backup1.filerecords())
-    b2recs = filter(lambda r: r.filetype == FileType.RegularFile, backup2.filerecords())
-
-    # put filerecords for boths sets in a dictionary by (domain, relativePath)
-    b1dict = {(r.domain, r.relativePath):r for r in b1recs}
-    b2dict = {(r.domain, r.relativePath):r for r in b2recs}
-
-    b1keys = set(b1dict.keys())
-    b2keys = set(b2dict.keys())
-
-    # files that only exist in b1
-    for k in b1keys-b2keys:
-        yield(b1dict[k], None)
-
-    # files that only exist in b2
-    for k in b2keys-b1keys:
-        yield(None, b2dict[k])
-
-    # files that exist in both sets
-    for k in b1keys.intersection(b2keys):
-        f1 = b1dict[k]
-        f2 = b2dict[k]
-        if f1.size != f2.size:
-            # if size differs, so does contents
-            yield(f1, f2)
-        elif f1.size == 0:
-            # both are empty, equal!
-            pass
-        else:
-            # compare by hash
-            if backup1.backuptype == BackupType.IOS10:
-                d1 = _os.path.join(backup1.rootdir, f1.fileID[0:2], f1.fileID)
-            elif backup1.backuptype == BackupType.IOS5TO9:
-                d1 = _os.path.join(backup1.rootdir, f1.fileID)
-            else:
-                raise ValueError('unexpected backuptype')
-
-            s1 = _sha256()
-            with open(d1, 'rb') as f:
-                s1.update(f.read())
-            if backup2.backuptype == BackupType.IOS10:
-                d2 = _os.path.join(backup2.rootdir, f2.fileID[0:2], f2.fileID)
-            elif backup2.backuptype == BackupType.IOS5TO9:
-                d2 = _os.path.join(backup2.rootdir, f2.fileID)
-            else:
-                raise ValueError('unexpected backuptype')
+    definition. The same holds when both backups are iOS10+ backups and both
+    records carry a digest: then the digests are compared instead of the
+    contents.
 
-            s2 = _sha256()
-            with open(d2, 'rb') as f:
-                s2.update(f.read())
-            if s1.digest() != s2.digest():
-                yield(f1, f2)
+    If by_metadata is True, contents are never compared. Files are then
+    considered equal when their size, mtime and inode are equal. This is a lot
+    faster, but might miss some changes.
 
+    If progress is True, a progress bar is shown for the records of backup1
+    that have been compared. '''
 
-def extract_changed_and_removed_files(backup1, backup2, outdir, hardlink=False):
+    b1recs = _sorted_file_records(backup1)
+    if progress is True:
+        total = _nr_of_files(backup1)
+        b1recs = _progresswrapper(b1recs, 'comparing', 'files', total)
+
+    # we are only interested in files, sorted by (domain, relativePath)
+    b1recs = filter(lambda r: r.filetype == FileType.RegularFile, b1recs)
+    b2recs = filter(lambda r: r.filetype == FileType.RegularFile, _sorted_file_records(backup2))
+
+    # walk through both sorted sequences at the same time (merge join)
+    f1 = next(b1recs, None)
+    f2 = next(b2recs, None)
+    while f1 is not None and f2 is not None:
+        k1 = (f1.domain, f1.relativePath)
+        k2 = (f2.domain, f2.relativePath)
+        if k1 < k2:
+            # file only exists in b1
+            yield(f1, None)
+            f1 = next(b1recs, None)
+        elif k2 < k1:
+            # file only exists in b2
+            yield(None, f2)
+            f2 = next(b2recs, None)
+        else:
+            if _file_changed(backup1, f1, backup2, f2, by_metadata):
+                yield(f1, f2)
+            f1 = next(b1recs, None)
+            f2 = next(b2recs, None)
+
+    # at most one of the sequences has some records left
+    if f1 is not None:
+        yield(f1, None)
+        for f1 in b1recs:
+            yield(f1, None)
+    if f2 is not None:
+        yield(None, f2)
+        for f2 in b2recs:
+            yield(None, f2)
+
+
+def extract_changed_and_removed_files(backup1, backup2, outdir, hardlink=False,
+                                      by_metadata=False, progress=False):
     ''' extract files from backup1 that are removed or changed in backup 2
 
     Note that this might not do what you expect. It extract files from
@@ -412,9 +544,11 @@ def extract_changed_and_removed_files(backup1, backup2, outdir, hardlink=False):
     since), you can flip the backup1 and backup2 arguments:
 
     >>> extract_changed_and_removed_files(new_backup, old_backup, outdir, True)
+
+    See changed_files for the by_metadata and progress arguments.
     '''
 
-    diffs = changed_files(backup1, backup2)
+    diffs = changed_files(backup1, backup2, by_metadata, progress)
     backup1_recs = (f1 for f1,f2 in diffs if f1 is not None)
     extract_files(backup1.backuptype, backup1_recs, backup1.rootdir, outdir, hardlink)
 
@@ -432,28 +566,42 @@ def _checkdir(indir):
 
     indir = _os.path.expanduser(indir)
 
-    if not _os.path.isdir(indir):
+    try:
+        with _os.scandir(indir) as it:
+            entries = set(e.name for e in it)
+    except (FileNotFoundError, NotADirectoryError):
         raise FileNotFoundError('backup directory does not exist!')
-    if len(_os.listdir(indir)) == 0:
+    if len(entries) == 0:
         raise FileExistsError('backup directory is empty!')
 
     # first check if this is a backup of a device with iOS10 or above
-    missing = set(expected_10plus) - set(_os.listdir(indir))
-    if missing == set():
+    if entries.issuperset(expected_10plus):
         return BackupType.IOS10
 
     # then check if this is a backup of a device with iOS5 through 9
-    missing = set(expected_5to9) - set(_os.listdir(indir))
-    if missing == set():
+    if entries.issuperset(expected_5to9):
         return BackupType.IOS5TO9
 
     raise PearBackError('could not determine backup type')
 
 
+@_lru_cache(maxsize=1<<16)
+def _epoch_to_utc(timestamp):
+    ''' convert seconds since epoch into a datetime object in UTC
+
+    Results are cached, since many files in a backup share timestamps. '''
+
+    return _datetime.fromtimestamp(timestamp, tz=_UTC)
+
+
 def _opendb(filepath):
     ''' open file as sqlite3 database, returning db connection object '''
     filepath = _os.path.expanduser(filepath)
     db = sqlite3.connect(filepath)
+    # these only affect this connection, the database itself is not modified
+    db.execute('PRAGMA mmap_size=268435456')
+    db.execute('PRAGMA cache_size=-65536')
+    db.execute('PRAGMA temp_store=MEMORY')
     return db
 
 
@@ -490,11 +638,29 @@ def _read_manifest_plist(manifestplist):
 
 
 def _db_file_records(db):
-    ''' yield all records from the Files table as namedtuples '''
+    ''' yield all records from the Files table as FileEntry objects '''
+
+    return _db_query_file_records(db, '''SELECT * FROM Files''')
+
+
+def _db_file_records_sorted(db):
+    ''' yield all records from the Files table sorted by (domain, relativePath)
+
+    Since SQLite compares text as UTF-8 bytes, this is the same order as
+    Python uses for strings, which changed_files relies on. '''
+
+    q = '''SELECT * FROM Files ORDER BY domain, relativePath'''
+    return _db_query_file_records(db, q)
+
+
+def _db_query_file_records(db, q):
+    ''' yield the records from the Files table selected by query q '''
 
     # perform the query
-    q = '''SELECT * FROM Files'''
-    c = db.cursor().execute(q)
+    c = db.cursor()
+    # fetch rows from sqlite in batches
+    c.arraysize = 8192
+    c.execute(q)
 
     # check if columns match what we expect
     colnames = list(zip(*c.description))[0]
@@ -503,40 +669,41 @@ def _db_file_records(db):
     if colnames != _expected_filerec:
         raise ValueError('Unexpected table layout for Files table')
 
-    # create a namedtuple for the unprocessed file records for convenience
-    record = _nt('file', ' '.join(colnames))
-
-    for r in c:
-        r = record(*r)
-        # the file column contains a plist that needs additional parsing
-        p = _db_parse_file_column(r.file)
-        # relativePath should match
-        if p.relpath != r.relativePath:
-            raise ValueError('relativePath mismatch!')
-
-        # the value in the flags field always seems to correspond to the
-        # filetype when derived from the mode field (1 = RegularFile,
-        # 2=Directory, 3=Symlink). Test this here and abort if this assumption
-        # is broken.
-        if (r.flags == 1 and p.filetype != FileType.RegularFile):
-            raise ValueError('assumption broken on flags field')
-        elif (r.flags == 2 and p.filetype != FileType.Directory):
-            raise ValueError('assumption broken on flags field')
-        elif (r.flags == 4 and p.filetype != FileType.Symlink):
-            raise ValueError('assumption broken on flags field')
-
-        yield _file_entry(r.fileID, r.domain, r.relativePath,
-                          p.uid, p.gid, p.mtime, p.ctime, p.btime, p.inode,
-                          p.mode, p.filetype, p.permissions, p.size,
-                          p.protection, p.extended_attributes, p.linktarget,
-                          p.digest)
+    rows = c.fetchmany()
+    while rows:
+        # unpack the plain tuples sqlite returns, no need to wrap each row
+        for fileID, domain, relativePath, flags, file in rows:
+            # the file column contains a plist that needs additional parsing
+            p = _db_parse_file_column(file)
+            # relativePath should match
+            if p.relpath != relativePath:
+                raise ValueError('relativePath mismatch!')
+
+            # the value in the flags field always seems to correspond to the
+            # filetype when derived from the mode field (1 = RegularFile,
+            # 2=Directory, 3=Symlink). Test this here and abort if this
+            # assumption is broken.
+            if (flags == 1 and p.filetype != FileType.RegularFile):
+                raise ValueError('assumption broken on flags field')
+            elif (flags == 2 and p.filetype != FileType.Directory):
+                raise ValueError('assumption broken on flags field')
+            elif (flags == 4 and p.filetype != FileType.Symlink):
+                raise ValueError('assumption broken on flags field')
+
+            yield FileEntry(fileID, domain, relativePath,
+                            p.uid, p.gid, p.mtime, p.ctime, p.btime, p.inode,
+                            p.mode, p.filetype, p.permissions, p.size,
+                            p.protection, p.extended_attributes, p.linktarget,
+                            p.digest)
+        rows = c.fetchmany()
 
 
 def _db_parse_file_column(bytes_):
     ''' parse the plist in the file column of the Files table of iOS10+ backups '''
 
-    # NOTE: using the plistlib parser failed, not sure why
-    p = _biplist.readPlistFromString(bytes_)
+    # NOTE: plistlib before Python 3.8 fails on these, since it does not
+    # support UIDs (see _read_bplist)
+    p = _read_bplist(bytes_)
 
     # check if we have the same fields as in our reference sample
     if set(p.keys()) != _known_plist_keys:
@@ -551,7 +718,7 @@ def _db_parse_file_column(bytes_):
     if archiver != 'NSKeyedArchiver':
         raise PlistParseError('$archiver != NSKeyedArchiver')
     root_uid = p.get('$top').get('root')
-    if root_uid.integer != 1:
+    if _uid_value(root_uid) != 1:
         raise PlistParseError("$top['root'] != Uid(1)")
 
     # the interesting data is in the $objects field
@@ -566,17 +733,17 @@ def _db_parse_file_column(bytes_):
 
     uid = objects[1].get('UserID')
     # contents modification time
-    mtime = _datetime(*list(_gmtime(objects[1].get('LastModified'))[0:7])+[_UTC])
+    mtime = _epoch_to_utc(objects[1].get('LastModified'))
     inode = objects[1].get('InodeNumber')
     mode = objects[1].get('Mode')
     # determine filetype and permissions based on mode
-    filetype = FileType(mode & 0xE000)
+    filetype = _filetypes[mode & 0xE000]
     permissions = oct(mode & 0x1FFF)
     # metadata-change time
-    ctime = _datetime(*list(_gmtime(objects[1].get('LastStatusChange'))[0:7])+[_UTC])
+    ctime = _epoch_to_utc(objects[1].get('LastStatusChange'))
     gid = objects[1].get('GroupID')
     # birth-time (aka creation time)
-    btime = _datetime(*list(_gmtime(objects[1].get('Birth'))[0:7])+[_UTC])
+    btime = _epoch_to_utc(objects[1].get('Birth'))
     size = objects[1].get('Size')
     # not sure what this is
     protection = objects[1].get('ProtectionClass')
@@ -587,12 +754,12 @@ def _db_parse_file_column(bytes_):
         raise PearBackError('assumption on plist flags field broken')
 
     # the Uid stored in 'RelativePath' seems to point to index in 'objects'
-    # where the actual value is stored. The Uid.integer property gives the
+    # where the actual value is stored. The _uid_value function gives the
     # integer value
-    relpath = objects[objects[1].get('RelativePath').integer]
+    relpath = objects[_uid_value(objects[1].get('RelativePath'))]
 
     # something similar for the '$class', which seems to be 'MBFile' always
-    class_= objects[objects[1].get('$class').integer].get('$classname')
+    class_= objects[_uid_value(objects[1].get('$class'))].get('$classname')
     if class_ != 'MBFile':
         raise PlistParseError('assumption broken: $class is not always MBFile')
 
@@ -601,8 +768,8 @@ def _db_parse_file_column(bytes_):
     # target item then contains a bplist with key-value pairs under the key
     # 'NS.data'
     if 'ExtendedAttributes' in objects[1]:
-        ea_idx = objects[1]['ExtendedAttributes'].integer
-        extended_attributes = _biplist.readPlistFromString(objects[ea_idx].get('NS.data'))
+        ea_idx = _uid_value(objects[1]['ExtendedAttributes'])
+        extended_attributes = _read_bplist(objects[ea_idx].get('NS.data'))
     else:
         extended_attributes = None
 
@@ -611,7 +778,7 @@ def _db_parse_file_column(bytes_):
     if filetype == FileType.Symlink:
         if 'Target' not in objects[1]:
             raise PlistParseError('Assumption broken on symlinks')
-        tgt_idx = objects[1]['Target'].integer
+        tgt_idx = _uid_value(objects[1]['Target'])
         linktarget = objects[tgt_idx]
     else:
         linktarget = None
@@ -619,7 +786,7 @@ def _db_parse_file_column(bytes_):
     # digest is also not always present, it works similar as above two fields,
     # let's store hex string instead of bytes
     if 'Digest' in objects[1]:
-        d_idx = objects[1]['Digest'].integer
+        d_idx = _uid_value(objects[1]['Digest'])
         digest = objects[d_idx]
         if type(digest) == dict:
             digest = digest['NS.data']
@@ -640,14 +807,168 @@ def _checkout(outdir):
 
     outdir = _os.path.expanduser(outdir)
 
-    if not _os.path.isdir(outdir):
+    # only need to see if there is a first entry to know it is not empty
+    try:
+        with _os.scandir(outdir) as it:
+            first = next(it, None)
+    except (FileNotFoundError, NotADirectoryError):
         raise FileNotFoundError('output directory does not exist!')
-    if len(_os.listdir(outdir)) != 0:
+    if first is not None:
         raise FileExistsError('output directory is not empty!')
 
     return outdir
 
 
+def _copyfile(source, target):
+    ''' copy contents of source to target, letting the kernel do the work
+
+    On macOS the file is cloned (copy-on-write on APFS), on Linux
+    copy_file_range is used (which creates reflinks on btrfs/XFS), with
+    sendfile as second option. These avoid copying the data through user
+    space. If none of these copies the entire file, we fall back to
+    shutil.copyfile.
+
+    The source is opened without updating its access time where possible, so
+    extracting leaves the backup untouched. '''
+
+    if _sys.platform == 'darwin' and _clonefile(source, target):
+        return
+
+    # copy_file_range may share the data of the source (reflink), so only
+    # preallocate the target when sendfile is used
+    kernelcopies = (('copy_file_range', _copy_file_range_chunk, False),
+                    ('sendfile', _sendfile_chunk, True))
+
+    with _open_noatime(source) as fsrc, open(target, 'wb') as fdst:
+        size = _os.fstat(fsrc.fileno()).st_size
+        for name, copychunk, preallocate in kernelcopies:
+            if not hasattr(_os, name):
+                continue
+            if preallocate:
+                _preallocate(fdst.fileno(), size)
+            copied = 0
+            try:
+                # both continue at the current offsets of the files, so we
+                # can simply repeat until the end of the source is reached
+                n = copychunk(fsrc.fileno(), fdst.fileno())
+                while n > 0:
+                    copied += n
+                    n = copychunk(fsrc.fileno(), fdst.fileno())
+            except OSError:
+                # not supported for this kernel or (combination of) filesystems
+                pass
+            if copied == size:
+                return
+            # some kernels and filesystems return 0 instead of raising an
+            # error, so start over and try the next method
+            _os.lseek(fsrc.fileno(), 0, _os.SEEK_SET)
+            _os.lseek(fdst.fileno(), 0, _os.SEEK_SET)
+            _os.ftruncate(fdst.fileno(), 0)
+
+    _shutil.copyfile(source, target)
+
+
+def _open_noatime(filepath):
+    ''' open filepath for reading without updating its access time
+
+    O_NOATIME is only available on Linux, and only allowed for the owner of
+    the file, so fall back to a regular open when it cannot be used. '''
+
+    noatime = getattr(_os, 'O_NOATIME', 0)
+    if noatime != 0:
+        try:
+            return open(_os.open(filepath, _os.O_RDONLY | noatime), 'rb')
+        except PermissionError:
+            pass
+    return open(filepath, 'rb')
+
+
+def _preallocate(fd, size):
+    ''' reserve size bytes for file fd, to avoid fragmentation '''
+
+    if size > 0 and hasattr(_os, 'posix_fallocate'):
+        try:
+            _os.posix_fallocate(fd, 0, size)
+        except OSError:
+            # not supported on all filesystems, in which case we just skip it
+            pass
+
+
+def _copy_file_range_chunk(fdin, fdout):
+    ''' copy next chunk of fdin to fdout with copy_file_range '''
+    return _os.copy_file_range(fdin, fdout, 1<<30)
+
+
+def _sendfile_chunk(fdin, fdout):
+    ''' copy next chunk of fdin to fdout with sendfile '''
+    return _os.sendfile(fdout, fdin, None, 1<<30)
+
+
+def _clonefile(source, target):
+    ''' clone source to target using clonefile(2), returns True on success '''
+
+    try:
+        import ctypes as _ctypes
+        clonefile = _ctypes.CDLL(None, use_errno=True).clonefile
+    except (ImportError, OSError, AttributeError):
+        return False
+
+    return clonefile(_os.fsencode(source), _os.fsencode(target), 0) == 0
+
+
+def _cachedir():
+    ''' return the directory where pearback stores its cache files '''
+
+    cachehome = _os.environ.get('XDG_CACHE_HOME', '')
+    if cachehome == '':
+        cachehome = _os.path.join(_os.path.expanduser('~'), '.cache')
+    return _os.path.join(cachehome, 'pearback')
+
+
+def _cached_file_records(cachefile, key, filerecords):
+    ''' yield file records from cachefile, or from filerecords() if needed
+
+    The cache is only used when it starts with the given key. When the cache
+    is not usable, the records from filerecords() are yielded and the cache
+    is (re)written once all records have been parsed. '''
+
+    try:
+        with open(cachefile, 'rb') as f:
+            if _pickle.load(f) == key:
+                rows = _pickle.load(f)
+            else:
+                rows = None
+    except Exception:
+        # no cache yet, or unreadable for some reason
+        rows = None
+
+    if rows is not None:
+        for r in rows:
+            yield FileEntry(*r)
+        return
+
+    # store plain tuples, these are a lot faster to (un)pickle
+    fields = _attrgetter(*FileEntry.__slots__)
+    rows = []
+    for r in filerecords():
+        rows.append(fields(r))
+        yield r
+
+    # write to a temporary file first and replace the cache afterwards, so
+    # other processes never see a partially written cache
+    tmpfile = '{:s}.{:d}.tmp'.format(cachefile, _os.getpid())
+    try:
+        _os.makedirs(_os.path.dirname(cachefile), mode=0o700, exist_ok=True)
+        with open(tmpfile, 'wb') as f:
+            _pickle.dump(key, f, _pickle.HIGHEST_PROTOCOL)
+            _pickle.dump(rows, f, _pickle.HIGHEST_PROTOCOL)
+        _os.replace(tmpfile, cachefile)
+    except OSError:
+        # cache directory might not be writable, we can do without the cache
+        if _os.path.exists(tmpfile):
+            _os.remove(tmpfile)
+
+
 def _progresswrapper(sequence, desc=None, unit='files', total=None):
     ''' a simple wrapper that prints a progressbar on iteration (using tqdm)
 
@@ -669,6 +990,86 @@ def _progresswrapper(sequence, desc=None, unit='files', total=None):
     return sequence
 
 
+def _sorted_file_records(backup):
+    ''' return filerecords of backup, sorted by (domain, relativePath) '''
+
+    if backup.filerecords.func is _db_file_records:
+        # let sqlite do the sorting
+        return _db_file_records_sorted(backup.db)
+
+    # records from Manifest.mbdb or from the cache
+    return sorted(backup.filerecords(), key=lambda r: (r.domain, r.relativePath))
+
+
+def _file_changed(backup1, f1, backup2, f2, by_metadata=False):
+    ''' returns True if contents of f1 in backup1 and f2 in backup2 differ
+
+    If by_metadata is True, only size, mtime and inode are compared. '''
+
+    if f1.size != f2.size:
+        # if size differs, so does contents
+        return True
+    elif f1.size == 0:
+        # both are empty, equal!
+        return False
+    elif by_metadata:
+        # assume contents is equal when this metadata is equal
+        return f1.mtime != f2.mtime or f1.inode != f2.inode
+
+    # iOS10+ backups may store a digest of the contents in Manifest.db
+    if (backup1.backuptype == BackupType.IOS10 and
+        backup2.backuptype == BackupType.IOS10 and
+        f1.digest and f2.digest):
+        # digests from manifest are available, no need to read contents
+        return f1.digest != f2.digest
+
+    # compare contents
+    if backup1.backuptype == BackupType.IOS10:
+        d1 = _os.path.join(backup1.rootdir, f1.fileID[0:2], f1.fileID)
+    elif backup1.backuptype == BackupType.IOS5TO9:
+        d1 = _os.path.join(backup1.rootdir, f1.fileID)
+    else:
+        raise ValueError('unexpected backuptype')
+
+    if backup2.backuptype == BackupType.IOS10:
+        d2 = _os.path.join(backup2.rootdir, f2.fileID[0:2], f2.fileID)
+    elif backup2.backuptype == BackupType.IOS5TO9:
+        d2 = _os.path.join(backup2.rootdir, f2.fileID)
+    else:
+        raise ValueError('unexpected backuptype')
+
+    return not _files_equal(d1, d2)
+
+
+def _files_equal(filepath1, filepath2, bufsize=1<<20):
+    ''' compare contents of two files, returning False on first difference '''
+
+    buf1 = bytearray(bufsize)
+    buf2 = bytearray(bufsize)
+    # compare through memoryviews, so no copies are made of the buffers
+    view1 = memoryview(buf1)
+    view2 = memoryview(buf2)
+    with open(filepath1, 'rb') as f1, open(filepath2, 'rb') as f2:
+        while True:
+            n1 = f1.readinto(buf1)
+            n2 = f2.readinto(buf2)
+            if n1 != n2:
+                return False
+            if not n1:
+                return True
+            if view1[:n1] != view2[:n2]:
+                return False
+
+
+def _nr_of_files(backup):
+    ''' return total number of file records in backup '''
+
+    if backup.backuptype == BackupType.IOS10:
+        return _db_nr_of_files(backup)
+    else:
+        return _mbdb_nr_of_files(backup)
+
+
 def _db_nr_of_files(backup):
     ''' return total number of Files in Manifest.db '''
 
@@ -676,15 +1077,52 @@ def _db_nr_of_files(backup):
     return c.fetchall()[0][0]
 
 
+def _mbdb_nr_of_files(backup):
+    ''' return total number of entries in Manifest.mbdb
+
+    This only walks over the length fields of the entries, without parsing
+    them, which is a lot cheaper than counting the parsed records. '''
+
+    with _open_mbdb(_os.path.join(backup.rootdir, 'Manifest.mbdb')) as mbdb:
+        size = len(mbdb)
+        pos = 6
+        count = 0
+        while pos < size:
+            # skip the 5 strings at the start of each entry
+            pos = _mbdb_skip_strings(mbdb, pos, 5)
+            # numprops is the last byte of the fixed size part
+            numprops = mbdb[pos+_mbdb_fixed.size-1]
+            pos = _mbdb_skip_strings(mbdb, pos+_mbdb_fixed.size, 2*numprops)
+            count += 1
+    return count
+
+
+def _mbdb_skip_strings(mbdb, pos, count):
+    ''' return position after skipping count strings in the mbdb file '''
+
+    for ii in range(count):
+        size = _mbdb_strlen.unpack_from(mbdb, pos)[0]
+        if size == 65535:
+            pos += 2
+        else:
+            pos += 2+size
+    return pos
+
+
 def _open_mbdb(filepath):
     ''' opens Manifest.mbdb file '''
 
     filepath = _os.path.expanduser(filepath)
-    # just read entire file into bytes object
+    # map the file into memory instead of reading it into a bytes object, so
+    # the OS pages it in on demand. The mmap object keeps its own duplicate of
+    # the file descriptor, so the file itself can be closed right away. Note
+    # that an empty file cannot be mapped (and is not a valid mbdb anyway).
     with open(filepath, 'rb') as f:
-        mbdb = f.read()
+        if _os.fstat(f.fileno()).st_size == 0:
+            raise MbdbParseError('{:s} is empty'.format(filepath))
+        mbdb = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
 
-    if mbdb[0:4].decode('utf8') != 'mbdb':
+    if mbdb[0:4] != b'mbdb':
         raise MbdbParseError('{:s} is not a mbdb file'.format(filepath))
     if int.from_bytes(mbdb[4:6], 'big') != 0x500:
         raise MbdbParseError('unexpected value encountered in Manifest.mbdb')
@@ -693,7 +1131,7 @@ def _open_mbdb(filepath):
 
 
 def _parse_mbdb(mbdb):
-    ''' yields file_entry objects from given mbdn array '''
+    ''' yields FileEntry objects from given mbdb buffer '''
     size = len(mbdb)
     pos = 6
     while pos < size:
@@ -721,40 +1159,27 @@ def _parse_mbdb_entry(mbdb, pos):
     if unknown != '':
         raise MbdbParseError('assumption broken on empty string in unknown field')
 
-    mode = int.from_bytes(mbdb[pos:pos+2], 'big')
-    pos+=2
-    inode = int.from_bytes(mbdb[pos:pos+8], 'big')
-    pos+=8
-    uid = int.from_bytes(mbdb[pos:pos+4], 'big')
-    pos+=4
-    gid = int.from_bytes(mbdb[pos:pos+4], 'big')
-    pos+=4
-    # some sources that I based this function on had a different
-    # order for these timestamps and in addition instead of a
-    # btime assumed an atime, which I think is incorrect based on some simple
-    # experiments (comparing timestamps on a rooted phone with backup
-    # timestamps).
-    mtime = _datetime(*list(_gmtime(int.from_bytes(mbdb[pos:pos+4], 'big'))[0:7])+[_UTC])
-    pos+=4
-    ctime = _datetime(*list(_gmtime(int.from_bytes(mbdb[pos:pos+4], 'big'))[0:7])+[_UTC])
-    pos+=4
-    btime = _datetime(*list(_gmtime(int.from_bytes(mbdb[pos:pos+4], 'big'))[0:7])+[_UTC])
-    pos+=4
-    size = int.from_bytes(mbdb[pos:pos+8], 'big')
-    pos+=8
     # Based on the different values I've encountered in the field that is
     # commonly called 'flags' in the scripts that I've used as source it would
     # seem that this is what is called 'protection' in the newer backups.
     # Perhaps these values represent some enum value of the protection level.
     # So, I've called this field 'protection' in contrast to the other scripts
     # out there.
-    protection = int.from_bytes(mbdb[pos:pos+1], 'big')
-    pos+=1
-    numprops = int.from_bytes(mbdb[pos:pos+1], 'big')
-    pos+=1
+    (mode, inode, uid, gid, mtime, ctime, btime, size, protection,
+     numprops) = _mbdb_fixed.unpack_from(mbdb, pos)
+    pos += _mbdb_fixed.size
+
+    # some sources that I based this function on had a different
+    # order for these timestamps and in addition instead of a
+    # btime assumed an atime, which I think is incorrect based on some simple
+    # experiments (comparing timestamps on a rooted phone with backup
+    # timestamps).
+    mtime = _epoch_to_utc(mtime)
+    ctime = _epoch_to_utc(ctime)
+    btime = _epoch_to_utc(btime)
 
     # determine filetype and permissions based on mode
-    filetype = FileType(mode & 0xE000)
+    filetype = _filetypes[mode & 0xE000]
     permissions = oct(mode & 0x1FFF)
 
     extended_attributes = _OD()
@@ -768,11 +1193,11 @@ def _parse_mbdb_entry(mbdb, pos):
     # hash over it
     fileID = _sha1('{:s}-{:s}'.format(domain, filename).encode('utf8')).hexdigest()
 
-    return _file_entry(fileID, domain, filename,
-                       uid, gid, mtime, ctime, btime, inode,
-                       mode, filetype, permissions, size,
-                       protection, extended_attributes, linktarget,
-                       digest), pos
+    return FileEntry(fileID, domain, filename,
+                     uid, gid, mtime, ctime, btime, inode,
+                     mode, filetype, permissions, size,
+                     protection, extended_attributes, linktarget,
+                     digest), pos
 
 
 def _mbdb_string(mbdb, pos):
@@ -782,15 +1207,15 @@ def _mbdb_string(mbdb, pos):
     is 0xffff, this indicates an empty string. The string is decoded as uft 8
     and if that fails, the bytes are returned as hexstring. '''
 
-    size = int.from_bytes(mbdb[pos:pos+2],'big')
-    if size == 65535:
+    size = _mbdb_strlen.unpack_from(mbdb, pos)[0]
+    if size == 65535 or size == 0:
         return '', pos+2
     else:
         val = mbdb[pos+2:pos+2+size]
         try:
-            val = val.decode('utf8')
-        except:
-            val = _hexlify(val).decode('utf8')
-        return val, pos+2+size
+            return val.decode('utf8'), pos+2+size
+        except UnicodeDecodeError:
+            # hexlify only produces ascii
+            return _hexlify(val).decode('ascii'), pos+2+size
 
 
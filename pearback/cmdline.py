@@ -28,11 +28,16 @@ SOFTWARE.
 
 import argparse as _argparse
 import os as _os
-from . import _pearback
+import sys as _sys
+from functools import lru_cache as _lru_cache
 
 
+@_lru_cache(maxsize=1)
 def _parser():
-    ''' argument parser '''
+    ''' argument parser
+
+    The parser is built only once, so repeated calls to main (i.e. when used
+    from other Python code) reuse it. '''
     parser = _argparse.ArgumentParser(
         prog='pearback',
         formatter_class = _argparse.RawDescriptionHelpFormatter,
@@ -60,12 +65,20 @@ def _parser():
 
     ext.add_argument('-P',
                      action="store_true",
-                     help='show progress indicator')
+                     help='show progress indicator (counts files queued ' +\
+                          'for copying)')
 
     ext.add_argument('-l',
                      action="store_true",
                      help='use hardlinks instead of copying files')
 
+    ext.add_argument('-j', '--jobs',
+                     metavar='N',
+                     type=int,
+                     default=min(32, (_os.cpu_count() or 1)*4),
+                     help='number of files to copy in parallel ' +\
+                          '(default: %(default)s)')
+
     # info mode
     lst = subparsers.add_parser('info', help='get info on backup')
 
@@ -94,6 +107,10 @@ def _parser():
                      action="store_true",
                      help='suppress header when listing files')
 
+    lst.add_argument('-P',
+                     action="store_true",
+                     help='show progress indicator (with -S)')
+
     # diff mode
     dif = subparsers.add_parser('diff', help='list or extract diffs between two backups')
 
@@ -113,45 +130,73 @@ def _parser():
                       action="store_true",
                       help='use hardlinks instead of copying files (requires -e)')
 
+    dif.add_argument('-P',
+                     action="store_true",
+                     help='show progress indicator')
+
+    dif.add_argument('--by-metadata',
+                     action="store_true",
+                     help='consider files equal when size, mtime and inode ' +\
+                          'are equal, instead of comparing contents')
+
     return parser
 
 
+def _diffline(diff):
+    ''' format a (file1, file2) tuple from changed_files as encoded line '''
+
+    # paths in the backup are always POSIX paths, so simply concatenate
+    # instead of using os.path.join
+    f1, f2 = diff
+    if f1 is not None:
+        f1 = f1.domain + '/' + f1.relativePath
+    else:
+        f1 = ''
+    if f2 is not None:
+        f2 = f2.domain + '/' + f2.relativePath
+    else:
+        f2 = ''
+    return (f1 + '\t' + f2 + '\n').encode('utf8')
+
+
 def main():
     ''' entry point '''
 
     parser = _parser()
     args = parser.parse_args()
 
+    # importing this is relatively expensive, so only do this after parsing
+    # the arguments (i.e. not when only printing help or usage errors)
+    from . import _pearback
+
     # diff mode
     if hasattr(args, 'backup1'):
 
         backup1 = getattr(args, 'backup1')
         backup2 = getattr(args, 'backup2')
-        b1 = _pearback.load_backup(backup1)
-        b2 = _pearback.load_backup(backup2)
+        b1 = _pearback.load_backup_cached(backup1)
+        b2 = _pearback.load_backup_cached(backup2)
+        by_metadata = getattr(args, 'by_metadata')
+        progress = getattr(args, 'P')
 
         # extract diff
-        if hasattr(args, 'e'):
+        if getattr(args, 'e') is not None:
             outdir = getattr(args, 'e')
             hardlink = False
             if getattr(args, 'l') is True:
                 hardlink = True
-            _pearback.extract_changed_and_removed_files(b1, b2, outdir, hardlink)
+            _pearback.extract_changed_and_removed_files(b1, b2, outdir, hardlink,
+                                                        by_metadata, progress)
             exit()
 
         # list diff
         else:
-            diff = _pearback.changed_files(b1, b2)
-            for (f1, f2) in diff:
-                if f1 is not None:
-                    f1 = _os.path.join(f1.domain, f1.relativePath)
-                else:
-                    f1 = ''
-                if f2 is not None:
-                    f2 = _os.path.join(f2.domain, f2.relativePath)
-                else:
-                    f2 = ''
-                print("{:s}\t{:s}".format(f1, f2))
+            diff = _pearback.changed_files(b1, b2, by_metadata, progress)
+            # write encoded lines to the underlying binary buffer, which
+            # avoids the overhead of a print call (and flush) per line
+            _sys.stdout.flush()
+            _sys.stdout.buffer.writelines(map(_diffline, diff))
+            _sys.stdout.buffer.flush()
             exit()
 
         parser.print_help()
@@ -162,12 +207,12 @@ def main():
         exit()
 
     # load the backup
-    backup = _pearback.load_backup(getattr(args, 'backupdir'))
+    backup = _pearback.load_backup_cached(getattr(args, 'backupdir'))
 
     # in info mode, we have either S, L or D
     if getattr(args, 'S', False) is True:
         # summarize backup
-        _pearback.summarize(backup)
+        _pearback.summarize(backup, getattr(args, 'P'))
         exit()
 
     elif getattr(args, 'L', False) is True:
@@ -180,9 +225,7 @@ def main():
         exit()
 
     elif getattr(args, 'D', False) is True:
-        date = backup.status.Date.isoformat()
-        date = date.split('.')[0].replace('-','').replace(':','')
-        print(date)
+        print(backup.status.Date.strftime('%Y%m%dT%H%M%S'))
         exit()
 
     # if we get here, this is extract mode
@@ -194,7 +237,8 @@ def main():
             hardlink = True
         if getattr(args, 'P') is True:
             progress = True
-        _pearback.extract(backup, outdir, hardlink, progress)
+        jobs = getattr(args, 'jobs')
+        _pearback.extract(backup, outdir, hardlink, progress, jobs)
         exit()
 
     else:
@@ -32,7 +32,7 @@ setup(
         'console_scripts': ['pearback=pearback.cmdline:main'],
         },
     install_requires=[
-        'biplist',
+        'biplist; python_version < "3.8"',
         'tqdm'
     ],
     zip_safe=False,